@@ -0,0 +1,172 @@
+"""
+离线批量处理：生成批量请求文件 → 本地执行 → 回收结果完成合并与分割
+
+    python batch_runner.py prepare a.txt b.txt -o batch.jsonl
+    python batch_runner.py run batch.jsonl results.jsonl --concurrency 32
+    python batch_runner.py finish a.txt b.txt --results results.jsonl -o out_dir
+
+run 子命令按 OpenAI Batch 的输入/输出格式逐行执行请求，每完成一个请求立即追加写入结果文件；
+中断后重新执行同一命令，会跳过结果文件中已成功的请求（断点续跑）。
+"""
+from typing import Dict, List, Optional, Set
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from section_splitter import SectionSplitter
+from log_config import setup_logging, log_context
+from text_structurizer import TextStructurizer, DEFAULT_BASE_URL, iter_batch_results
+
+logger = logging.getLogger(__name__)
+
+def load_completed(results_path: str) -> Set[str]:
+    """
+    读取结果文件中已成功完成的请求 custom_id
+    """
+    if not os.path.exists(results_path):
+        return set()
+    return {record["custom_id"] for record in iter_batch_results(results_path)}
+
+def truncate_partial_line(results_path: str):
+    """
+    截掉结果文件末尾写了一半的行，保证续跑时追加的记录从新行开始
+    """
+    if not os.path.exists(results_path):
+        return
+
+    with open(results_path, 'rb+') as f:
+        end = f.seek(0, 2)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            logger.warning(f"结果文件末尾有不完整的记录，已截断 {end - position} 字节")
+            f.truncate(position)
+
+async def run_batch(batch_path: str, results_path: str, api_key: str,
+                    base_url: str = DEFAULT_BASE_URL, concurrency: int = 16) -> int:
+    """
+    并发执行批量请求文件，结果逐行追加写入结果文件
+
+    Returns:
+        int: 本次执行失败的请求数
+    """
+    from openai import AsyncOpenAI
+    client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+
+    completed = load_completed(results_path)
+    with open(batch_path, 'r', encoding='utf-8') as f:
+        requests = [json.loads(line) for line in f if line.strip()]
+    pending = iter([r for r in requests if r["custom_id"] not in completed])
+    logger.info(f"共 {len(requests)} 个请求，已完成 {len(completed)} 个")
+
+    failed = 0
+
+    async def worker(out):
+        nonlocal failed
+        # 多个协程共享同一个迭代器，取下一个请求时不会被打断
+        for request in pending:
+            job_id, _, chunk_id = request["custom_id"].rpartition('#')
+            with log_context(job_id=job_id, chunk_id=chunk_id):
+                record = {"custom_id": request["custom_id"], "response": None, "error": None}
+                try:
+                    response = await client.chat.completions.create(**request["body"])
+                    record["response"] = {"status_code": 200, "body": response.model_dump()}
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"请求 {request['custom_id']} 失败: {str(e)}")
+                    record["error"] = {"message": str(e)}
+
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()
+
+    truncate_partial_line(results_path)
+    with open(results_path, 'a', encoding='utf-8') as out:
+        await asyncio.gather(*(worker(out) for _ in range(concurrency)))
+
+    logger.info(f"批量执行完成，失败 {failed} 个")
+    return failed
+
+def read_jobs(files: List[str]) -> Dict[str, str]:
+    """
+    读取输入文件，以文件路径作为任务标识
+    """
+    jobs = {}
+    for file_path in files:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            jobs[file_path] = f.read()
+    return jobs
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="离线批量文本整理")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    prepare = subparsers.add_parser('prepare', help="生成批量请求文件")
+    prepare.add_argument('files', nargs='+', help="输入文件")
+    prepare.add_argument('-o', '--output', required=True, help="批量请求文件路径")
+
+    run = subparsers.add_parser('run', help="本地执行批量请求文件，支持断点续跑")
+    run.add_argument('batch', help="批量请求文件路径")
+    run.add_argument('results', help="结果文件路径")
+    run.add_argument('--base-url', default=DEFAULT_BASE_URL, help="API 地址")
+    run.add_argument('--concurrency', type=int, default=16, help="并发请求数")
+
+    finish = subparsers.add_parser('finish', help="根据结果文件合并并分割章节")
+    finish.add_argument('files', nargs='+', help="与 prepare 相同的输入文件")
+    finish.add_argument('--results', required=True, help="结果文件路径")
+    finish.add_argument('-o', '--output-dir', help="输出目录，省略时保存在原目录下")
+    finish.add_argument('--dedup', type=float, metavar='THRESHOLD',
+                        help="开启近似重复章节检测，指定相似度阈值（如 0.85）")
+    finish.add_argument('--dedup-mode', choices=['collapse', 'flag'], default='collapse',
+                        help="collapse 删除近似重复章节，flag 保留并添加标记（默认 collapse）")
+
+    return parser.parse_args(argv)
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    setup_logging()
+    args = parse_args(argv)
+    load_dotenv()
+    api_key = os.getenv('OPENAI_API_KEY')
+
+    if args.command == 'run':
+        if not api_key:
+            logger.error("未找到API密钥")
+            return 1
+        failed = await run_batch(args.batch, args.results, api_key, args.base_url, args.concurrency)
+        return 1 if failed else 0
+
+    structurizer = TextStructurizer.from_env(api_key)
+    jobs = read_jobs(args.files)
+
+    if args.command == 'prepare':
+        structurizer.write_batch_file(jobs, args.output)
+        return 0
+
+    splitter = SectionSplitter(dedup_threshold=args.dedup, dedup_mode=args.dedup_mode)
+    merged = await structurizer.ingest_batch_results(jobs, args.results)
+    for file_path, content in merged.items():
+        if args.output_dir:
+            output_path = Path(args.output_dir) / f"{Path(file_path).stem}_processed.txt"
+        else:
+            output_path = Path(file_path).with_stem(Path(file_path).stem + "_processed")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(splitter.split_sections(content)))
+        logger.info(f"处理完成：{output_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,11 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from text_structurizer import TextStructurizer
 from section_splitter import SectionSplitter
+from section_dedup import DEFAULT_DEDUP_THRESHOLD
+from pipeline import TextPipeline, FileSink, read_file_blocks
+from log_config import setup_logging, log_context
 import asyncio
 import os
 from dotenv import load_dotenv
 import logging
+import time
 from pathlib import Path
 
 class TextStructurizerGUI:
@@ -18,9 +21,8 @@ class TextStructurizerGUI:
         load_dotenv()
         self.api_key = os.getenv('OPENAI_API_KEY')
         
-        # 初始化处理器
-        self.structurizer = TextStructurizer(self.api_key)
-        self.splitter = SectionSplitter()
+        # 初始化处理器，文本整理器在首次需要整理时才创建
+        self._structurizer = None
         
         # 设置日志
         self.setup_logging()
@@ -29,22 +31,25 @@ class TextStructurizerGUI:
         self.create_widgets()
         
         self.output_dir = None  # 添加输出目录属性
+        self.batch_count = 0  # 小文件合并处理的批次计数，用于生成日志任务标识
+        
+    @property
+    def structurizer(self):
+        """文本整理器，首次使用时才导入大模型相关模块"""
+        if self._structurizer is None:
+            from text_structurizer import TextStructurizer
+            self._structurizer = TextStructurizer.from_env(self.api_key)
+        return self._structurizer
+        
+    @property
+    def splitter(self) -> SectionSplitter:
+        """按当前选项创建章节分割器"""
+        return SectionSplitter(dedup_threshold=DEFAULT_DEDUP_THRESHOLD if self.need_dedup.get() else None)
         
     def setup_logging(self):
         """配置日志系统"""
+        setup_logging()
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
-        
-        # 创建处理器
-        handler = logging.StreamHandler()
-        handler.setLevel(logging.INFO)
-        
-        # 创建格式化器
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        
-        # 添加处理器
-        self.logger.addHandler(handler)
         
     def create_widgets(self):
         """创建GUI组件"""
@@ -80,6 +85,22 @@ class TextStructurizerGUI:
         )
         self.structuring_check.pack(side=tk.LEFT, padx=5)
         
+        self.pack_small_files = tk.BooleanVar(value=True)
+        self.pack_check = ttk.Checkbutton(
+            options_frame,
+            text="小文件合并请求",
+            variable=self.pack_small_files
+        )
+        self.pack_check.pack(side=tk.LEFT, padx=5)
+        
+        self.need_dedup = tk.BooleanVar(value=False)
+        self.dedup_check = ttk.Checkbutton(
+            options_frame,
+            text="删除近似重复章节",
+            variable=self.need_dedup
+        )
+        self.dedup_check.pack(side=tk.LEFT, padx=5)
+        
         # 进度显示区域
         progress_frame = ttk.LabelFrame(self.root, text="处理进度", padding="10")
         progress_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -129,31 +150,19 @@ class TextStructurizerGUI:
     async def process_file(self, file_path: str):
         """处理单个文件"""
         try:
-            # 读取文件
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
             # 文本整理（可选）
+            structurizer = None
             if self.need_structuring.get():
                 self.log_text.insert(tk.END, f"正在整理文本：{file_path}\n")
-                content = await self.structurizer.process_text(content)
-            
-            # 章节分割
-            self.log_text.insert(tk.END, f"正在分割章节：{file_path}\n")
-            sections = self.splitter.split_sections(content)
+                structurizer = self.structurizer
             
-            # 构建输出路径
-            if self.output_dir:
-                output_path = Path(self.output_dir) / f"{Path(file_path).stem}_processed.txt"
-            else:
-                output_path = Path(file_path).with_stem(Path(file_path).stem + "_processed")
+            output_path = self.get_output_path(file_path)
             
-            # 确保输出目录存在
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 保存结果
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(sections))
+            # 读取、整理、章节分割和保存以流水线方式边读边写
+            self.log_text.insert(tk.END, f"正在分割章节：{file_path}\n")
+            pipeline = TextPipeline(self.splitter, structurizer)
+            async with FileSink(output_path) as sink:
+                await pipeline.run(read_file_blocks(file_path), sink, job_id=Path(file_path).name)
             
             self.log_text.insert(tk.END, f"处理完成：{output_path}\n")
             self.log_text.see(tk.END)
@@ -163,6 +172,63 @@ class TextStructurizerGUI:
             self.log_text.insert(tk.END, f"错误：{str(e)}\n")
             self.log_text.see(tk.END)
             
+    def get_output_path(self, file_path: str) -> Path:
+        """构建输出路径"""
+        if self.output_dir:
+            return Path(self.output_dir) / f"{Path(file_path).stem}_processed.txt"
+        return Path(file_path).with_stem(Path(file_path).stem + "_processed")
+    
+    def read_small_files(self, files) -> dict:
+        """读取不超过一个文本块大小的小文件，返回 {文件路径: 内容}"""
+        chunk_size = self.structurizer.chunk_size
+        small_files = {}
+        for file_path in files:
+            try:
+                # UTF-8 每个字符最多4个字节，先按文件大小粗筛
+                if os.path.getsize(file_path) > chunk_size * 4:
+                    continue
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception as e:
+                self.logger.error(f"读取文件时出错：{str(e)}")
+                continue
+            if len(content) <= chunk_size:
+                small_files[file_path] = content
+        return small_files
+    
+    async def process_small_files(self, small_files: dict) -> set:
+        """将多个小文件打包进同一请求整理，再分别分割保存，返回处理成功的文件"""
+        done = set()
+        self.log_text.insert(tk.END, f"正在合并整理 {len(small_files)} 个小文件\n")
+        self.root.update()
+        try:
+            self.batch_count += 1
+            job_id = f"batch-{time.strftime('%Y%m%d%H%M%S')}-{self.batch_count}"
+            with log_context(job_id=job_id):
+                results = await self.structurizer.process_documents(list(small_files.values()))
+        except Exception as e:
+            self.logger.error(f"合并整理小文件时出错：{str(e)}")
+            self.log_text.insert(tk.END, f"错误：{str(e)}\n")
+            self.log_text.see(tk.END)
+            return done
+        
+        for file_path, content in zip(small_files, results):
+            if isinstance(content, Exception):
+                self.log_text.insert(tk.END, f"合并整理失败，改为单独处理：{file_path}\n")
+                continue
+            try:
+                output_path = self.get_output_path(file_path)
+                async with FileSink(output_path) as sink:
+                    for section in self.splitter.split_sections(content):
+                        await sink(section)
+                self.log_text.insert(tk.END, f"处理完成：{output_path}\n")
+                done.add(file_path)
+            except Exception as e:
+                self.logger.error(f"处理文件时出错：{str(e)}")
+                self.log_text.insert(tk.END, f"错误：{str(e)}\n")
+        self.log_text.see(tk.END)
+        return done
+            
     def start_processing(self):
         """开始处理文件"""
         if not hasattr(self, 'files') or not self.files:
@@ -178,10 +244,23 @@ class TextStructurizerGUI:
             self.progress['maximum'] = len(self.files)
             self.progress['value'] = 0
             
-            for i, file in enumerate(self.files):
+            # 小文件合并为少量请求处理，其余文件及合并处理失败的小文件逐个处理
+            small_files = {}
+            done = set()
+            if self.need_structuring.get() and self.pack_small_files.get():
+                small_files = self.read_small_files(self.files)
+            if small_files:
+                self.status_label.config(text=f"正在处理 {len(small_files)} 个小文件")
+                done = await self.process_small_files(small_files)
+                self.progress['value'] = len(done)
+                self.root.update()
+            
+            for file in self.files:
+                if file in done:
+                    continue
                 self.status_label.config(text=f"正在处理：{Path(file).name}")
                 await self.process_file(file)
-                self.progress['value'] = i + 1
+                self.progress['value'] += 1
                 self.root.update()
             
             self.status_label.config(text="处理完成")
@@ -0,0 +1,199 @@
+"""
+日志配置：所有日志先进入内存队列，由后台线程批量写入控制台和轮转日志文件，
+避免在事件循环线程上进行磁盘 I/O。
+
+日志记录带有 job_id / chunk_id 字段（通过 log_context 设置），便于区分并发任务；
+热点路径的调试日志使用 SAMPLED 级别，按调用位置采样输出。
+"""
+from typing import Optional
+from contextlib import contextmanager
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# 采样级别：介于 DEBUG 与 INFO 之间，日志级别为 DEBUG 时全部输出，为 SAMPLED 时按比例采样
+SAMPLED = 15
+logging.addLevelName(SAMPLED, 'SAMPLED')
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(job_id)s:%(chunk_id)s] - %(message)s'
+
+job_id_var = contextvars.ContextVar('job_id', default='-')
+chunk_id_var = contextvars.ContextVar('chunk_id', default='-')
+
+_listener = None
+_queue_handler = None
+
+@contextmanager
+def log_context(job_id=None, chunk_id=None):
+    """
+    在当前上下文（线程或 asyncio 任务）中设置日志的任务和文本块标识
+    """
+    tokens = []
+    if job_id is not None:
+        tokens.append((job_id_var, job_id_var.set(str(job_id))))
+    if chunk_id is not None:
+        tokens.append((chunk_id_var, chunk_id_var.set(str(chunk_id))))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+class ContextFilter(logging.Filter):
+    """
+    在产生日志的线程中记录 job_id / chunk_id，必须挂在 QueueHandler 上
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.job_id = job_id_var.get()
+        record.chunk_id = chunk_id_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    SAMPLED 级别的日志按调用位置每 sample_every 条输出一条
+    """
+    def __init__(self, sample_every: int):
+        super().__init__()
+        self.sample_every = sample_every
+        self.counters = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != SAMPLED or self.sample_every <= 1:
+            return True
+        # DEBUG 级别下不采样
+        if logging.getLogger().getEffectiveLevel() <= logging.DEBUG:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self.counters.get(key, 0)
+        self.counters[key] = count + 1
+        return count % self.sample_every == 0
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    按大小轮转的文件处理器，累积 batch_size 条或超过 flush_interval 秒才刷新一次
+    """
+    def __init__(self, filename: str, max_bytes: int, backup_count: int,
+                 batch_size: int = 50, flush_interval: float = 1.0):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = 0
+        self.size = None
+        self.last_flush = time.monotonic()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            data = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.size is None:
+                self.stream.seek(0, 2)
+                self.size = self.stream.tell()
+
+            length = len(data.encode('utf-8'))
+            # 自行统计文件大小，避免每条日志都 seek/tell 触发刷新
+            if self.maxBytes > 0 and self.size + length > self.maxBytes and self.size > 0:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+                self.size = 0
+
+            self.stream.write(data)
+            self.size += length
+            self.pending += 1
+            if self.pending >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """
+    队列空闲超过 flush_interval 秒时主动刷新各处理器，保证批量缓存不会长时间滞留
+    """
+    def __init__(self, log_queue: queue.Queue, *handlers, flush_interval: float = 1.0):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block: bool):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    handler.flush()
+
+def setup_logging(log_file: Optional[str] = 'text_structurizer.log', level: Optional[int] = None,
+                  console: bool = True, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  sample_every: int = 100, batch_size: int = 50,
+                  flush_interval: float = 1.0) -> logging.handlers.QueueListener:
+    """
+    配置日志系统，重复调用时复用已有配置，不会重复添加处理器
+
+    Args:
+        log_file: 日志文件路径，None 表示不写文件
+        level: 根日志级别，设为 SAMPLED 可看到采样后的热点日志；
+               省略时首次配置使用 INFO，重复调用时保持当前级别
+        console: 是否输出到控制台
+        max_bytes: 单个日志文件的大小上限，超过后轮转
+        backup_count: 保留的历史日志文件数
+        sample_every: SAMPLED 级别日志的采样间隔
+        batch_size: 文件处理器每累积多少条日志刷新一次
+        flush_interval: 文件处理器最长刷新间隔（秒）
+
+    Returns:
+        QueueListener: 后台写日志的监听器，程序退出时自动调用 shutdown_logging 停止
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    if _listener is not None:
+        if level is not None:
+            root.setLevel(level)
+        return _listener
+
+    root.setLevel(logging.INFO if level is None else level)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+    if log_file:
+        file_handler = BatchingRotatingFileHandler(log_file, max_bytes, backup_count,
+                                                   batch_size=batch_size, flush_interval=flush_interval)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(sample_every))
+    _queue_handler.addFilter(ContextFilter())
+    root.addHandler(_queue_handler)
+
+    _listener = BatchingQueueListener(log_queue, *handlers, flush_interval=flush_interval)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging():
+    """
+    停止后台写日志线程，写完队列中剩余的日志
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        _listener = None
+        _queue_handler = None
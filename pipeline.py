@@ -0,0 +1,276 @@
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from pathlib import Path
+import asyncio
+import logging
+import os
+
+from section_splitter import SectionSplitter
+from log_config import log_context
+from text_structurizer import TextStructurizer, TextChunker, ResultMerger, split_sentences
+
+# 队列结束标记
+_EOF = None
+
+async def read_file_blocks(file_path: str, block_size: int = 64 * 1024) -> AsyncIterator[str]:
+    """
+    分块读取文件，文件读写放在线程中执行，不阻塞事件循环
+    """
+    f = await asyncio.to_thread(open, file_path, 'r', encoding='utf-8')
+    try:
+        while True:
+            block = await asyncio.to_thread(f.read, block_size)
+            if not block:
+                break
+            yield block
+    finally:
+        await asyncio.to_thread(f.close)
+
+async def iter_text(text: str) -> AsyncIterator[str]:
+    """
+    将内存中的文本包装为流水线输入
+    """
+    yield text
+
+class FileSink:
+    """
+    增量写出章节的输出文件，章节之间以换行分隔。
+    先写入临时文件，全部成功后再重命名为目标文件；出错时删除临时文件，不留下不完整的输出。
+    """
+    def __init__(self, output_path: Path):
+        self.output_path = output_path
+        self.temp_path = output_path.with_name(output_path.name + '.tmp')
+        self.file = None
+        self.count = 0
+
+    async def __aenter__(self) -> 'FileSink':
+        # 确保输出目录存在
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = await asyncio.to_thread(open, self.temp_path, 'w', encoding='utf-8')
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await asyncio.to_thread(self.file.close)
+        if exc_type is None:
+            await asyncio.to_thread(os.replace, self.temp_path, self.output_path)
+        else:
+            await asyncio.to_thread(self.temp_path.unlink, missing_ok=True)
+
+    async def __call__(self, section: str):
+        text = section if self.count == 0 else '\n' + section
+        self.count += 1
+        await asyncio.to_thread(self.file.write, text)
+
+class TextPipeline:
+    def __init__(self, splitter: SectionSplitter, structurizer: Optional[TextStructurizer] = None,
+                 workers: int = 4, queue_size: int = 8):
+        """
+        初始化流水线：读取 → 分块 → 大模型整理 → 按序合并 → 增量分割 → 写出
+
+        各阶段之间用有界队列连接，下游来不及处理时上游自动等待（背压），
+        因此内存占用与输入大小无关，分块、分割等CPU阶段可以与网络等待重叠。
+
+        Args:
+            splitter: 章节分割器
+            structurizer: 文本整理器，为 None 时跳过整理，直接分割
+            workers: 并发处理文本块的数量。第 i 块开始处理前会等待第 i-workers 块及之前的结果合并完成，
+                     以其标题作为前文结构，为1时与逐块顺序处理的效果一致
+            queue_size: 每个队列的容量
+        """
+        self.splitter = splitter
+        self.structurizer = structurizer
+        self.workers = workers
+        self.queue_size = queue_size
+        self.logger = logging.getLogger(__name__)
+
+    async def run(self, source: AsyncIterator[str], sink: Callable[[str], Awaitable[None]],
+                  job_id: Optional[str] = None) -> int:
+        """
+        运行流水线
+
+        Args:
+            source: 输入文本的异步迭代器，可以按任意边界分块
+            sink: 逐个接收分割后章节的异步回调
+            job_id: 任务标识，写入本次运行产生的所有日志
+
+        Returns:
+            int: 输出的章节数
+        """
+        text_queue = asyncio.Queue(self.queue_size)
+        merged_queue = asyncio.Queue(self.queue_size)
+        section_queue = asyncio.Queue(self.queue_size)
+        self.section_count = 0
+
+        stages = [
+            self._read(source, text_queue),
+            self._split(merged_queue if self.structurizer else text_queue, section_queue),
+            self._write(section_queue, sink),
+        ]
+
+        if self.structurizer:
+            self.structurizer.tokens_used = 0
+            chunk_queue = asyncio.Queue(self.queue_size)
+            result_queue = asyncio.Queue(self.queue_size)
+            # 限制在途文本块数量，避免乱序结果在合并阶段无限堆积
+            self.window = asyncio.Semaphore(self.workers + 2 * self.queue_size)
+            self.previous_titles = set()
+            self.merged_count = 0
+            self.merge_progress = asyncio.Condition()
+            stages += [self._chunk(text_queue, chunk_queue),
+                       self._merge(result_queue, merged_queue)]
+            stages += [self._structure(chunk_queue, result_queue) for _ in range(self.workers)]
+
+        # 各阶段任务创建时继承当前上下文中的 job_id
+        with log_context(job_id=job_id):
+            await self._run_stages(stages)
+
+        if self.structurizer and self.structurizer.token_budget is not None:
+            self.logger.info(f"本次任务消耗 token：{self.structurizer.tokens_used}/{self.structurizer.token_budget}")
+        return self.section_count
+
+    async def _run_stages(self, stages: List[Awaitable]):
+        """
+        并发运行所有阶段，任一阶段出错时取消其余阶段并抛出异常
+        """
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _read(self, source: AsyncIterator[str], out_queue: asyncio.Queue):
+        async for block in source:
+            await out_queue.put(block)
+        await out_queue.put(_EOF)
+
+    async def _chunk(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        """
+        按段落增量分块，与 TextStructurizer.split_text 的结果一致。
+        未读完的段落超过块大小时按句子增量分块，只保留最后一个未结束的句子，
+        因此即使输入没有空行，内存占用也不随输入增长。
+        """
+        chunk_size = self.structurizer.chunk_size
+        chunker = TextChunker(chunk_size)
+        # 尚未读完的段落中未处理的部分
+        buffer = ""
+        # buffer 所在段落是否已按特长段落开始逐句分块
+        in_long_paragraph = False
+        # 全文不超过块大小时按原文整体处理，只需保留这部分原文
+        raw_text = ""
+        index = 0
+
+        async def emit(chunks: List[str]):
+            nonlocal index
+            for chunk in chunks:
+                await self.window.acquire()
+                await out_queue.put((index, chunk))
+                index += 1
+
+        async def end_paragraph(para: str):
+            nonlocal in_long_paragraph
+            if in_long_paragraph:
+                for sentence in split_sentences(para):
+                    await emit(chunker.add_sentence(sentence))
+                await emit(chunker.end_long_paragraph())
+                in_long_paragraph = False
+            else:
+                await emit(chunker.add_paragraph(para))
+
+        while (block := await in_queue.get()) is not _EOF:
+            if raw_text is not None:
+                raw_text += block
+                if len(raw_text) <= chunk_size:
+                    continue
+                block, raw_text = raw_text, None
+
+            paragraphs = (buffer + block).split('\n\n')
+            buffer = paragraphs.pop()
+            for para in paragraphs:
+                await end_paragraph(para)
+
+            # 末尾的换行可能与下一块开头的换行组成段落分隔，不计入段落长度
+            if len(buffer) - buffer.endswith('\n') > chunk_size:
+                # 段落已超过块大小，必然按句子分割；先处理已结束的句子
+                if not in_long_paragraph:
+                    await emit(chunker.begin_long_paragraph())
+                    in_long_paragraph = True
+                sentences = split_sentences(buffer)
+                buffer = sentences.pop()
+                for sentence in sentences:
+                    await emit(chunker.add_sentence(sentence))
+
+        if raw_text is not None:
+            await emit([raw_text])
+        else:
+            await end_paragraph(buffer)
+            await emit(chunker.flush())
+
+        self.logger.info(f"文本已分割为 {index} 个块")
+        for _ in range(self.workers):
+            await out_queue.put(_EOF)
+
+    async def _structure(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        while (item := await in_queue.get()) is not _EOF:
+            index, chunk = item
+            # 前文结构取自已按序合并的结果
+            async with self.merge_progress:
+                await self.merge_progress.wait_for(lambda: self.merged_count > index - self.workers)
+            previous_structure = "\n".join(sorted(self.previous_titles)) if self.previous_titles else ""
+            with log_context(chunk_id=index):
+                result = await self.structurizer.structure_chunk(
+                    chunk,
+                    is_first=(index == 0),
+                    previous_structure=previous_structure
+                )
+            await out_queue.put((index, result))
+        await out_queue.put(_EOF)
+
+    async def _merge(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        """
+        按块序号重新排序并增量合并整理结果
+        """
+        merger = ResultMerger()
+        pending = {}
+        next_index = 0
+        finished_workers = 0
+
+        while finished_workers < self.workers:
+            item = await in_queue.get()
+            if item is _EOF:
+                finished_workers += 1
+                continue
+
+            index, result = item
+            pending[index] = result
+            while next_index in pending:
+                result = pending.pop(next_index)
+                next_index += 1
+                self.window.release()
+
+                # 提取当前块的标题并添加到已有标题集合中
+                self.previous_titles.update(line.strip() for line in result.split('\n')
+                                            if line.strip().startswith('#'))
+                piece = merger.add(result)
+                async with self.merge_progress:
+                    self.merged_count += 1
+                    self.merge_progress.notify_all()
+                if piece:
+                    await out_queue.put(piece)
+
+        await out_queue.put(_EOF)
+
+    async def _split(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        stream = self.splitter.stream()
+        while (text := await in_queue.get()) is not _EOF:
+            for section in stream.feed(text):
+                await out_queue.put(section)
+        for section in stream.close():
+            await out_queue.put(section)
+        await out_queue.put(_EOF)
+
+    async def _write(self, in_queue: asyncio.Queue, sink: Callable[[str], Awaitable[None]]):
+        while (section := await in_queue.get()) is not _EOF:
+            await sink(section)
+            self.section_count += 1
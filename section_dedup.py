@@ -0,0 +1,130 @@
+from typing import Dict, List, Optional, Tuple
+import re
+import zlib
+
+# 空桶标记，大于任何 32 位哈希值
+EMPTY_BIN = 1 << 32
+# 默认的近似重复相似度阈值
+DEFAULT_DEDUP_THRESHOLD = 0.85
+# 正文 shingle 数少于该值的章节不做检测，过短的正文（如"（略）"）相互之间相似度总是很高
+DEFAULT_MIN_SHINGLES = 20
+HEADER_PATTERN = re.compile(r'^#{1,6}\s+')
+
+class MinHashDeduplicator:
+    def __init__(self, threshold: float = DEFAULT_DEDUP_THRESHOLD, num_perm: int = 64, bands: int = 16, shingle_size: int = 5,
+                 min_shingles: int = DEFAULT_MIN_SHINGLES):
+        """
+        基于 MinHash + LSH 的近似重复章节检测器，单遍处理，耗时与章节数近似线性。
+        只有自身标题（最后一个标题行）相同、且正文相似的章节才判定为重复。
+
+        使用单哈希分桶的 MinHash（one permutation hashing）：每个 shingle 只计算一次 crc32，
+        按哈希值分到 num_perm 个桶中取最小值，签名再按 bands 分段建立 LSH 索引。
+
+        Args:
+            threshold: 判定为近似重复的 Jaccard 相似度下限
+            num_perm: 签名长度（桶数）
+            bands: LSH 分段数，num_perm 必须能被整除
+            shingle_size: 字符 shingle 长度
+            min_shingles: 正文 shingle 数少于该值的章节不参与检测
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+        self.signatures: List[List[int]] = []
+        self.headings: List[Optional[str]] = []
+        self.buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(bands)]
+
+    def _shingles(self, text: str) -> set:
+        """
+        提取正文（不含标题行）的字符 shingle，空白统一压缩
+        """
+        body = ' '.join(line.strip() for line in text.split('\n')
+                        if line.strip() and not HEADER_PATTERN.match(line.strip()))
+        body = re.sub(r'\s+', ' ', body)
+        if len(body) <= self.shingle_size:
+            return {body}
+        return {body[i:i + self.shingle_size] for i in range(len(body) - self.shingle_size + 1)}
+
+    def _heading(self, text: str) -> Optional[str]:
+        """
+        章节自身的标题，即最后一个标题行；没有标题时返回 None
+        """
+        headings = [line.strip() for line in text.split('\n') if HEADER_PATTERN.match(line.strip())]
+        return headings[-1] if headings else None
+
+    def signature(self, text: str) -> List[int]:
+        """
+        计算文本的 MinHash 签名
+        """
+        return self._signature(self._shingles(text))
+
+    def _signature(self, shingles: set) -> List[int]:
+        signature = [EMPTY_BIN] * self.num_perm
+        for shingle in shingles:
+            h = zlib.crc32(shingle.encode('utf-8'))
+            index = h % self.num_perm
+            if h < signature[index]:
+                signature[index] = h
+        return signature
+
+    def similarity(self, a: List[int], b: List[int]) -> float:
+        """
+        由签名估计 Jaccard 相似度，两边都为空的桶不计入
+        """
+        matched = total = 0
+        for x, y in zip(a, b):
+            if x == EMPTY_BIN and y == EMPTY_BIN:
+                continue
+            total += 1
+            if x == y:
+                matched += 1
+        return matched / total if total else 1.0
+
+    def check(self, text: str) -> Optional[Tuple[int, float]]:
+        """
+        检查文本是否与已登记的同标题文本近似重复；不重复时登记该文本，正文过短时既不检测也不登记
+
+        Returns:
+            Optional[Tuple[int, float]]: 重复时返回 (原文本登记序号, 估计相似度)，否则返回 None
+        """
+        shingles = self._shingles(text)
+        if len(shingles) < self.min_shingles:
+            return None
+
+        heading = self._heading(text)
+        signature = self._signature(shingles)
+        band_keys = []
+        checked = set()
+        best = None
+
+        for band in range(self.bands):
+            key = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            # 全为空桶的分段没有区分度，不参与索引
+            if all(value == EMPTY_BIN for value in key):
+                band_keys.append(None)
+                continue
+            band_keys.append(key)
+
+            for candidate in self.buckets[band].get(key, ()):
+                if candidate in checked or self.headings[candidate] != heading:
+                    continue
+                checked.add(candidate)
+                score = self.similarity(signature, self.signatures[candidate])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (candidate, score)
+
+        if best is not None:
+            return best
+
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        self.headings.append(heading)
+        for band, key in enumerate(band_keys):
+            if key is not None:
+                self.buckets[band].setdefault(key, []).append(index)
+        return None
@@ -1,17 +1,27 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import re
 import logging
 
+from section_dedup import MinHashDeduplicator
+
 class SectionSplitter:
-    def __init__(self):
+    def __init__(self, dedup_threshold: Optional[float] = None, dedup_mode: str = 'collapse'):
         """
         初始化章节分割器
+        
+        Args:
+            dedup_threshold: 近似重复章节的相似度阈值（0~1），None 表示不去重
+            dedup_mode: 'collapse' 删除近似重复章节，'flag' 保留并在章节末尾添加标记
         """
         self.logger = logging.getLogger(__name__)
         # 支持6级标题
         self.max_level = 6
         # 定义目录相关的关键词
         self.toc_keywords = {'目录', 'contents', 'table of contents', 'toc'}
+        if dedup_mode not in ('collapse', 'flag'):
+            raise ValueError(f"不支持的去重方式: {dedup_mode}")
+        self.dedup_threshold = dedup_threshold
+        self.dedup_mode = dedup_mode
 
     def split_sections(self, markdown_text: str) -> List[str]:
         """
@@ -19,52 +29,25 @@ class SectionSplitter:
         """
         self.logger.info("开始按章节分割文本...")
         
-        # 第一步：按标题分割文本
-        sections = self._split_by_headers(markdown_text)
-        
-        # 第二步：过滤掉不需要的段落
-        filtered_sections = self._filter_sections(sections)
+        stream = self.stream()
+        filtered_sections = stream.feed(markdown_text) + stream.close()
         
         self.logger.info(f"文本已分割为 {len(filtered_sections)} 个章节")
         return filtered_sections
 
-    def _split_by_headers(self, markdown_text: str) -> List[str]:
+    def create_deduplicator(self) -> Optional[MinHashDeduplicator]:
         """
-        第一步：按标题进行初始分割
+        为一次分割创建近似重复检测器，未开启去重时返回 None
         """
-        current_titles = {level: None for level in range(1, self.max_level + 1)}
-        sections = []
-        current_section = []
-        
-        lines = markdown_text.split('\n')
-        for line in lines:
-            if line.strip():  # 忽略空行
-                # 检查是否是标题行
-                header_match = re.match(r'^(#{1,6})\s+(.+)$', line)
-                if header_match:
-                    level = len(header_match.group(1))
-                    
-                    # 如果已经有内容，保存当前段落
-                    if current_section:
-                        section_text = self._build_section(current_titles, current_section)
-                        sections.append(section_text)
-                        current_section = []
-                    
-                    # 更新当前层级的标题
-                    current_titles[level] = line
-                    # 清除所有下级标题
-                    for i in range(level + 1, self.max_level + 1):
-                        current_titles[i] = None
-                
-                # 将当前行添加到当前段落
-                current_section.append(line)
-        
-        # 处理最后一个段落
-        if current_section:
-            section_text = self._build_section(current_titles, current_section)
-            sections.append(section_text)
-            
-        return sections
+        if self.dedup_threshold is None:
+            return None
+        return MinHashDeduplicator(threshold=self.dedup_threshold)
+
+    def stream(self) -> 'SectionStream':
+        """
+        创建增量分割器，可分多次输入文本，章节一旦完整即输出
+        """
+        return SectionStream(self)
 
     def _filter_sections(self, sections: List[str]) -> List[str]:
         """
@@ -87,11 +70,16 @@ class SectionSplitter:
             if not self._has_actual_content(section):
                 continue
                 
-            # 添加分隔符
-            filtered_sections.append(section + "\n\n" + "-" * 40 + "\n")
+            filtered_sections.append(section)
             
         return filtered_sections
 
+    def _format_section(self, section: str) -> str:
+        """
+        为输出的段落添加分隔符
+        """
+        return section + "\n\n" + "-" * 40 + "\n"
+
     def _has_actual_content(self, section: str) -> bool:
         """
         检查段落是否包含实际内容（不仅仅是标题）
@@ -197,4 +185,109 @@ class SectionSplitter:
                 level = len(header_match.group(1))
                 titles[f"level{level}"] = header_match.group(2)
                 
-        return titles 
\ No newline at end of file
+        return titles
+
+class SectionStream:
+    """
+    增量章节分割器：按任意边界接收文本，遇到下一个标题时输出上一个完整章节
+    """
+    def __init__(self, splitter: SectionSplitter):
+        self.splitter = splitter
+        self.current_titles = {level: None for level in range(1, splitter.max_level + 1)}
+        self.current_section = []
+        # 尚未遇到换行的残余文本
+        self.buffer = ""
+        self.deduplicator = splitter.create_deduplicator()
+        # 已输出章节数，以及登记到检测器中的章节对应的输出序号
+        self.output_count = 0
+        self.indexed_positions = []
+        self.duplicate_count = 0
+
+    def feed(self, text: str) -> List[str]:
+        """
+        输入一段文本，返回其中已经完整的章节（已过滤并带分隔符）
+        """
+        lines = (self.buffer + text).split('\n')
+        self.buffer = lines.pop()
+        return self._emit(self._split_lines(lines))
+
+    def close(self) -> List[str]:
+        """
+        结束输入，返回剩余的章节
+        """
+        sections = self._split_lines([self.buffer])
+        self.buffer = ""
+        
+        # 处理最后一个段落
+        if self.current_section:
+            sections.append(self.splitter._build_section(self.current_titles, self.current_section))
+            self.current_section = []
+        
+        sections = self._emit(sections)
+        if self.duplicate_count:
+            self.splitter.logger.info(f"检测到 {self.duplicate_count} 个近似重复章节")
+        return sections
+
+    def _emit(self, sections: List[str]) -> List[str]:
+        """
+        过滤段落，开启去重时再做近似重复检测，最后添加分隔符
+        """
+        output = []
+        for section in self.splitter._filter_sections(sections):
+            if self.deduplicator is not None:
+                section = self.check_duplicate(section)
+                if section is None:
+                    continue
+            output.append(self.splitter._format_section(section))
+        return output
+
+    def check_duplicate(self, section: str) -> Optional[str]:
+        """
+        近似重复检测：collapse 模式下重复章节返回 None，flag 模式下返回添加了标记的章节
+        """
+        match = self.deduplicator.check(section)
+        if match is None:
+            # 正文过短的章节不会登记到检测器中
+            if len(self.indexed_positions) < len(self.deduplicator.signatures):
+                self.indexed_positions.append(self.output_count)
+            self.output_count += 1
+            return section
+        
+        self.duplicate_count += 1
+        if self.splitter.dedup_mode == 'collapse':
+            return None
+        
+        original, score = match
+        self.output_count += 1
+        return section + f"\n\n<!-- 疑似重复：与第 {self.indexed_positions[original] + 1} 个章节相似度 {score:.2f} -->"
+
+    def _split_lines(self, lines: List[str]) -> List[str]:
+        """
+        按标题分割若干完整的行，返回因遇到新标题而结束的章节
+        """
+        sections = []
+        max_level = self.splitter.max_level
+        
+        for line in lines:
+            if line.strip():  # 忽略空行
+                # 检查是否是标题行
+                header_match = re.match(r'^(#{1,6})\s+(.+)$', line)
+                if header_match:
+                    level = len(header_match.group(1))
+                    
+                    # 如果已经有内容，保存当前段落
+                    if self.current_section:
+                        section_text = self.splitter._build_section(self.current_titles, self.current_section)
+                        sections.append(section_text)
+                        self.current_section = []
+                    
+                    # 更新当前层级的标题
+                    self.current_titles[level] = line
+                    # 清除所有下级标题
+                    for i in range(level + 1, max_level + 1):
+                        self.current_titles[i] = None
+                
+                # 将当前行添加到当前段落
+                self.current_section.append(line)
+        
+        return sections
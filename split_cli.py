@@ -0,0 +1,78 @@
+"""
+非交互式章节分割入口：只对已经结构化的 Markdown 做章节分割，适合在 shell 管道中使用
+
+    python split_cli.py < input.md > output.txt
+    python split_cli.py a.md b.md -o out_dir
+
+本模块只依赖 section_splitter，不导入任何大模型相关模块，启动耗时在几十毫秒以内。
+"""
+from typing import List, Optional, TextIO
+from pathlib import Path
+import argparse
+import sys
+
+from section_splitter import SectionSplitter
+
+def split_stream(splitter: SectionSplitter, source: TextIO, target: TextIO) -> int:
+    """
+    逐行读取输入并增量输出章节，章节之间以换行分隔
+
+    Returns:
+        int: 输出的章节数
+    """
+    stream = splitter.stream()
+    count = 0
+
+    def write(sections: List[str]):
+        nonlocal count
+        for section in sections:
+            target.write(section if count == 0 else '\n' + section)
+            count += 1
+
+    for line in source:
+        write(stream.feed(line))
+    write(stream.close())
+    return count
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="按 Markdown 标题分割章节（不进行文本整理）")
+    parser.add_argument('files', nargs='*', help="输入文件，省略或为 - 时读取标准输入")
+    parser.add_argument('-o', '--output-dir',
+                        help="输出目录，每个输入文件写入 <文件名>_processed.txt；省略时输出到标准输出")
+    parser.add_argument('--dedup', type=float, metavar='THRESHOLD',
+                        help="开启近似重复章节检测，指定相似度阈值（如 0.85）")
+    parser.add_argument('--dedup-mode', choices=['collapse', 'flag'], default='collapse',
+                        help="collapse 删除近似重复章节，flag 保留并添加标记（默认 collapse）")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    splitter = SectionSplitter(dedup_threshold=args.dedup, dedup_mode=args.dedup_mode)
+    files = args.files or ['-']
+
+    try:
+        for file_path in files:
+            if file_path == '-':
+                split_stream(splitter, sys.stdin, sys.stdout)
+                continue
+
+            with open(file_path, 'r', encoding='utf-8') as source:
+                if args.output_dir:
+                    output_path = Path(args.output_dir) / f"{Path(file_path).stem}_processed.txt"
+                    output_path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(output_path, 'w', encoding='utf-8') as target:
+                        split_stream(splitter, source, target)
+                else:
+                    split_stream(splitter, source, sys.stdout)
+    except BrokenPipeError:
+        # 下游命令（如 head）提前关闭管道时静默退出
+        sys.stderr.close()
+        return 0
+    except OSError as e:
+        print(f"处理过程中出现错误：{str(e)}", file=sys.stderr)
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
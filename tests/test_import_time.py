@@ -0,0 +1,36 @@
+"""
+导入耗时回归检查：仅做章节分割的入口不能加载大模型相关模块
+"""
+from pathlib import Path
+import json
+import subprocess
+import sys
+import unittest
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ['openai', 'httpx', 'tqdm']
+
+def loaded_modules(module: str, candidates: list) -> list:
+    """
+    在新的解释器中导入 module，返回 candidates 中已被加载的模块
+    """
+    code = (
+        "import sys, json\n"
+        f"import {module}\n"
+        f"print(json.dumps([m for m in {candidates!r} if m in sys.modules]))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output)
+
+class ImportTimeTest(unittest.TestCase):
+    def test_split_cli_does_not_load_llm_modules(self):
+        self.assertEqual(loaded_modules('split_cli', HEAVY_MODULES + ['text_structurizer']), [])
+
+    def test_structuring_modules_defer_llm_imports(self):
+        for module in ['text_structurizer', 'pipeline', 'log_config', 'section_splitter', 'section_dedup']:
+            with self.subTest(module=module):
+                self.assertEqual(loaded_modules(module, HEAVY_MODULES), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+流水线测试：使用假的 API 客户端，不发出网络请求
+"""
+from types import SimpleNamespace
+from pathlib import Path
+import asyncio
+import importlib.util
+import logging
+import sys
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from section_splitter import SectionSplitter
+from pipeline import TextPipeline, iter_text
+from text_structurizer import TextStructurizer
+
+logging.disable(logging.CRITICAL)
+
+class FakeClient:
+    """
+    模拟 AsyncOpenAI：记录每次请求的文本块，返回加上标题的原文
+    """
+    def __init__(self, on_request=None):
+        self.chunks = []
+        self.on_request = on_request
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages):
+        prompt = messages[-1]['content']
+        self.chunks.append(prompt)
+        if self.on_request:
+            self.on_request()
+        # 每个结果都带有相同的一级标题，用于检验合并时的重复标题去除
+        content = f"# 文档\n## 第{len(self.chunks)}部分\n{prompt}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                               usage=None)
+
+def make_structurizer(chunk_size: int, client: FakeClient) -> TextStructurizer:
+    structurizer = TextStructurizer('test-key', chunk_size=chunk_size)
+    structurizer._client = client
+    return structurizer
+
+async def collect(pipeline: TextPipeline, source) -> list:
+    sections = []
+
+    async def sink(section: str):
+        sections.append(section)
+
+    await pipeline.run(source, sink)
+    return sections
+
+class ChunkStreamingTest(unittest.TestCase):
+    def test_text_without_blank_lines_is_chunked_incrementally(self):
+        # 扫描件、OCR 文本常常整篇没有空行
+        block = "这是一段没有空行的扫描文本。" * 50
+        block_count = 40
+        blocks_read = 0
+        first_request_at = []
+
+        async def source():
+            nonlocal blocks_read
+            for _ in range(block_count):
+                blocks_read += 1
+                yield block
+
+        client = FakeClient(on_request=lambda: first_request_at or first_request_at.append(blocks_read))
+        structurizer = make_structurizer(300, client)
+        asyncio.run(collect(TextPipeline(SectionSplitter(), structurizer, workers=1, queue_size=2),
+                            source()))
+
+        # 第一个文本块在输入读完之前就已发出请求
+        self.assertLess(first_request_at[0], block_count)
+        expected = structurizer.split_text(block * block_count)
+        self.assertEqual(len(client.chunks), len(expected))
+        for prompt, chunk in zip(client.chunks, expected):
+            self.assertIn(chunk, prompt)
+
+class PipelineEquivalenceTest(unittest.TestCase):
+    TEXT = "\n\n".join(
+        [f"第{i}段。" + "这是正文内容。" * (i % 7 + 1) for i in range(60)]
+        + ["这是一个很长的段落。" * 80]
+        + [f"# 原有标题{i}\n内容{i}。" for i in range(5)]
+    )
+
+    @unittest.skipUnless(importlib.util.find_spec('tqdm'), "process_text 需要 tqdm")
+    def test_single_worker_matches_process_text(self):
+        splitter = SectionSplitter()
+        structurizer = make_structurizer(300, FakeClient())
+        expected = splitter.split_sections(asyncio.run(structurizer.process_text(self.TEXT)))
+
+        structurizer = make_structurizer(300, FakeClient())
+        sections = asyncio.run(collect(TextPipeline(splitter, structurizer, workers=1), iter_text(self.TEXT)))
+        self.assertEqual(sections, expected)
+
+    def test_split_only_matches_split_sections(self):
+        splitter = SectionSplitter()
+        sections = asyncio.run(collect(TextPipeline(splitter), iter_text(self.TEXT)))
+        self.assertEqual(sections, splitter.split_sections(self.TEXT))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+章节分割测试
+"""
+from pathlib import Path
+import logging
+import sys
+import unittest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from section_splitter import SectionSplitter
+
+logging.disable(logging.CRITICAL)
+
+SEPARATOR = "\n\n" + "-" * 40 + "\n"
+
+class SplitSectionsTest(unittest.TestCase):
+    def test_output_matches_baseline(self):
+        # 期望结果由改为增量分割之前的 split_sections 生成
+        text = (
+            "前言内容，没有标题。\n\n"
+            "# 目录\n## 第一章\n## 第二章\n\n"
+            "# 第一章 总则\n## 第一条\n本条规定适用范围。\n\n"
+            "## 第二条\n本条规定基本原则。\n第二行内容。\n### 说明\n补充说明。\n"
+            "## 空标题\n# 第二章 附则\n正文内容。\n   \n#不是标题\n"
+            "## 第三条 \n最后一条。"
+        )
+        expected = [
+            "前言内容，没有标题。" + SEPARATOR,
+            "# 第一章 总则\n## 第一条\n\n本条规定适用范围。" + SEPARATOR,
+            "# 第一章 总则\n## 第二条\n\n本条规定基本原则。\n第二行内容。" + SEPARATOR,
+            "# 第一章 总则\n## 第二条\n### 说明\n\n补充说明。" + SEPARATOR,
+            "# 第二章 附则\n\n正文内容。\n#不是标题" + SEPARATOR,
+            "# 第二章 附则\n## 第三条 \n\n最后一条。" + SEPARATOR,
+        ]
+        self.assertEqual(SectionSplitter().split_sections(text), expected)
+
+    def test_stream_matches_split_sections(self):
+        text = "# 一\n内容一\n## 二\n内容二\n\n# 三\n内容三\n"
+        stream = SectionSplitter().stream()
+        sections = []
+        for line in text.splitlines(keepends=True):
+            sections.extend(stream.feed(line))
+        sections.extend(stream.close())
+        self.assertEqual(sections, SectionSplitter().split_sections(text))
+
+class DedupTest(unittest.TestCase):
+    BODY = "本条规定了适用范围以及相关的基本原则，所有单位都应当遵守。" * 2
+
+    def test_short_bodies_under_different_headings_are_kept(self):
+        text = "# 总则\n## 第一条\n（略）\n## 第二条\n（略）\n## 第三条\n本条规定了很多内容。"
+        sections = SectionSplitter(dedup_threshold=0.85).split_sections(text)
+        self.assertEqual(sections, SectionSplitter().split_sections(text))
+
+    def test_same_body_under_different_heading_is_kept(self):
+        text = f"# 总则\n## 第一条\n{self.BODY}\n## 第二条\n{self.BODY}"
+        self.assertEqual(len(SectionSplitter(dedup_threshold=0.85).split_sections(text)), 2)
+
+    def test_repeated_section_is_collapsed(self):
+        text = f"# 总则\n## 第一条\n{self.BODY}\n## 第一条\n{self.BODY}\n## 第二条\n补充内容。"
+        sections = SectionSplitter(dedup_threshold=0.85).split_sections(text)
+        self.assertEqual([section.split('\n')[1] for section in sections], ["## 第一条", "## 第二条"])
+
+    def test_flag_mode_points_to_original_section(self):
+        text = f"# 总则\n## 第一条\n（略）\n## 第二条\n{self.BODY}\n## 第二条\n{self.BODY}"
+        sections = SectionSplitter(dedup_threshold=0.85, dedup_mode='flag').split_sections(text)
+        self.assertEqual(len(sections), 3)
+        self.assertIn("与第 2 个章节相似度", sections[2])
+
+if __name__ == '__main__':
+    unittest.main()
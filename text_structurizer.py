@@ -1,25 +1,235 @@
-from typing import List, Dict
-from openai import AsyncOpenAI
+from typing import List, Dict, Iterator, Optional, Union
 import asyncio
+import json
+import os
 import re
 import logging
-from tqdm import tqdm
+
+from log_config import SAMPLED, log_context
+
+DEFAULT_BASE_URL = "https://api.bianxie.ai/v1"
+
+# 已有编号或列表标记的行（说明原文本身结构清晰）
+NUMBERING_PATTERN = re.compile(
+    r'^(#{1,6}\s|\d+[.)、]|[一二三四五六七八九十]+、|第[一二三四五六七八九十百\d]+[章节条部分]|[-*]\s)'
+)
+HEADER_PATTERN = re.compile(r'^#{1,6}\s+')
+CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+LATIN_PATTERN = re.compile(r'[A-Za-z]')
+
+# 难度评分达到该值的文本块交给强模型处理
+HARD_CHUNK_SCORE = 1.0
+# 校验时整理结果正文至少保留原文字符数的比例
+MIN_CONTENT_RATIO = 0.8
+# 预算消耗超过该比例后不再使用强模型（包括失败升级）
+STRONG_MODEL_BUDGET_RATIO = 0.5
+# 每次请求固定的提示词开销（估算）
+PROMPT_OVERHEAD_TOKENS = 200
+
+SYSTEM_PROMPT = "你是一个专业的文档结构化助手，善于将文本整理为清晰的层级结构。"
+
+# 多文档打包请求中每个文档的起止标记
+DOC_START_MARK = "<<<DOC {doc_id}>>>"
+DOC_END_MARK = "<<<END {doc_id}>>>"
+DOC_BLOCK_PATTERN = re.compile(r'<<<DOC (\d+)>>>[ \t]*\n?(.*?)\n?[ \t]*<<<END \1>>>', re.S)
+
+def iter_batch_results(results_path: str) -> Iterator[Dict]:
+    """
+    逐行读取批量结果文件，只返回成功的结果记录。
+    中断时可能留下写了一半的行，无法解析的行直接跳过。
+    """
+    with open(results_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                continue
+            yield record
+
+def split_sentences(text: str) -> List[str]:
+    """
+    按句末标点（。！？）切分句子，标点保留在句尾，最后一项为没有句末标点的剩余部分
+    """
+    parts = re.split('(。|！|？)', text)
+    return [parts[i] + parts[i + 1] if i + 1 < len(parts) else parts[i]
+            for i in range(0, len(parts), 2)]
+
+class TextChunker:
+    """
+    增量文本分块器：逐段落输入，凑满一块即输出，供 split_text 和流水线共用
+    """
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.current_chunk = ""
+        # 特长段落中尚未凑满的句子
+        self.sentence_chunk = ""
+
+    def add_paragraph(self, para: str) -> List[str]:
+        """
+        加入一个段落，返回因此凑满的文本块
+        """
+        chunks = []
+        # 如果当前段落本身就超过了chunk_size，需要分割
+        if len(para) > self.chunk_size:
+            # 处理特长段落：按句子分割
+            chunks.extend(self.begin_long_paragraph())
+            for sentence in split_sentences(para):
+                chunks.extend(self.add_sentence(sentence))
+            chunks.extend(self.end_long_paragraph())
+        else:
+            # 处理普通段落
+            if len(self.current_chunk) + len(para) + 2 <= self.chunk_size:
+                self.current_chunk += (para + '\n\n')
+            else:
+                if self.current_chunk:
+                    chunks.append(self.current_chunk.strip())
+                self.current_chunk = para + '\n\n'
+        
+        return chunks
+
+    def begin_long_paragraph(self) -> List[str]:
+        """
+        开始一个特长段落，之后通过 add_sentence 逐句加入，可以在段落尚未读完时增量分块
+        """
+        chunks = []
+        if self.current_chunk:
+            chunks.append(self.current_chunk)
+            self.current_chunk = ""
+        self.sentence_chunk = ""
+        return chunks
+
+    def add_sentence(self, sentence: str) -> List[str]:
+        """
+        向特长段落加入一个句子，返回因此凑满的文本块
+        """
+        if len(self.sentence_chunk) + len(sentence) <= self.chunk_size:
+            self.sentence_chunk += sentence
+            return []
+        chunks = [self.sentence_chunk] if self.sentence_chunk else []
+        self.sentence_chunk = sentence
+        return chunks
+
+    def end_long_paragraph(self) -> List[str]:
+        """
+        结束特长段落，输出剩余的句子
+        """
+        chunks = [self.sentence_chunk] if self.sentence_chunk else []
+        self.sentence_chunk = ""
+        return chunks
+
+    def flush(self) -> List[str]:
+        """
+        输出剩余的未满文本块
+        """
+        chunks = [self.current_chunk.strip()] if self.current_chunk else []
+        self.current_chunk = ""
+        return chunks
+
+class ResultMerger:
+    """
+    增量结果合并器：按顺序接收各块的整理结果，返回需要追加到输出末尾的文本
+    """
+    def __init__(self):
+        self.existing_titles = None
+        # 已输出文本的末尾两个字符，用于判断分隔换行
+        self.tail = ""
+
+    def add(self, result: str) -> str:
+        """
+        合并一个整理结果，返回新增的文本片段
+        """
+        # 使用第一个结果作为基础
+        if self.existing_titles is None:
+            structure = '\n'.join(line.strip() for line in result.split('\n')
+                                  if line.strip().startswith('#'))
+            self.existing_titles = set(structure.split('\n'))
+            self.tail = result[-2:]
+            return result
+        
+        content_lines = []
+        for line in result.split('\n'):
+            stripped_line = line.strip()
+            # 处理标题行，跳过已有的标题
+            if stripped_line.startswith('#'):
+                if stripped_line not in self.existing_titles:
+                    content_lines.append(line)
+                    self.existing_titles.add(stripped_line)
+            # 只添加非空行和有意义的内容
+            elif stripped_line and not stripped_line.isspace():
+                content_lines.append(line)
+        
+        if not content_lines:
+            return ""
+        
+        # 确保与已有内容之间有适当的分隔
+        piece = ""
+        if not self.tail.endswith('\n'):
+            piece += '\n'
+        if not (self.tail + piece).endswith('\n\n'):
+            piece += '\n'
+        piece += '\n'.join(content_lines)
+        self.tail = (self.tail + piece)[-2:]
+        return piece
 
 class TextStructurizer:
-    def __init__(self, api_key: str, chunk_size: int = 3000):
+    def __init__(self, api_key: str, chunk_size: int = 3000,
+                 fast_model: str = "gpt-4o-mini", strong_model: str = "gpt-4o",
+                 token_budget: Optional[int] = None):
         """
         初始化文本结构化处理器
         
         Args:
             api_key: API密钥
             chunk_size: 每段文本的最大字符数（默认3000，约1000个汉字）
+            fast_model: 处理简单文本块的快速低价模型
+            strong_model: 处理复杂文本块、以及快速模型校验失败时升级使用的模型
+            token_budget: 单次任务（一次 process_text 调用）的 token 上限，None 表示不限制
         """
-        self.client = AsyncOpenAI(
-            api_key=api_key,
-            base_url="https://api.bianxie.ai/v1"
-        )
+        self.api_key = api_key
+        self._client = None
         self.chunk_size = chunk_size
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.token_budget = token_budget
+        self.tokens_used = 0
+        # 已发出但尚未返回的请求预占的 token，并发请求据此共同遵守预算
+        self.tokens_reserved = 0
         self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_env(cls, api_key: str, **kwargs) -> 'TextStructurizer':
+        """
+        按环境变量（可写在 .env 中）创建文本整理器：
+        FAST_MODEL、STRONG_MODEL 指定模型，TOKEN_BUDGET 指定单次任务的 token 上限，未设置时使用默认值
+        """
+        if os.getenv('FAST_MODEL'):
+            kwargs.setdefault('fast_model', os.getenv('FAST_MODEL'))
+        if os.getenv('STRONG_MODEL'):
+            kwargs.setdefault('strong_model', os.getenv('STRONG_MODEL'))
+        if os.getenv('TOKEN_BUDGET'):
+            try:
+                kwargs.setdefault('token_budget', int(os.getenv('TOKEN_BUDGET')))
+            except ValueError:
+                raise ValueError(f"TOKEN_BUDGET 必须是整数：{os.getenv('TOKEN_BUDGET')}")
+        return cls(api_key, **kwargs)
+
+    @property
+    def client(self):
+        """
+        API 客户端，首次调用大模型时才导入 openai 并创建，避免拖慢仅做分割的场景
+        """
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=DEFAULT_BASE_URL
+            )
+        return self._client
         
     def split_text(self, text: str) -> List[str]:
         """
@@ -36,46 +246,11 @@ class TextStructurizer:
             return [text]
         
         # 按段落分割文本
-        paragraphs = text.split('\n\n')
+        chunker = TextChunker(self.chunk_size)
         chunks = []
-        current_chunk = ""
-        
-        for para in paragraphs:
-            # 如果当前段落本身就超过了chunk_size，需要分割
-            if len(para) > self.chunk_size:
-                # 处理特长段落
-                if current_chunk:
-                    chunks.append(current_chunk)
-                    current_chunk = ""
-                
-                # 按句子分割特长段落
-                sentences = re.split('(。|！|？)', para)
-                temp_chunk = ""
-                for i in range(0, len(sentences), 2):
-                    sentence = sentences[i]
-                    if i + 1 < len(sentences):
-                        sentence += sentences[i + 1]
-                    
-                    if len(temp_chunk) + len(sentence) <= self.chunk_size:
-                        temp_chunk += sentence
-                    else:
-                        if temp_chunk:
-                            chunks.append(temp_chunk)
-                        temp_chunk = sentence
-                
-                if temp_chunk:
-                    chunks.append(temp_chunk)
-            else:
-                # 处理普通段落
-                if len(current_chunk) + len(para) + 2 <= self.chunk_size:
-                    current_chunk += (para + '\n\n')
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
-                    current_chunk = para + '\n\n'
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        for para in text.split('\n\n'):
+            chunks.extend(chunker.add_paragraph(para))
+        chunks.extend(chunker.flush())
         
         return chunks
 
@@ -155,7 +330,160 @@ class TextStructurizer:
         # 组合标题和内容
         return "\n".join(relevant_titles + [""] + section_content)
 
-    async def process_chunk(self, chunk: str, is_first: bool = False, previous_structure: str = None) -> str:
+    def classify_chunk(self, chunk: str) -> str:
+        """
+        根据本地特征（长度、已有编号、行密度、中英混排）估计文本块的整理难度
+        
+        Returns:
+            str: 'easy' 或 'hard'
+        """
+        lines = [line.strip() for line in chunk.split('\n') if line.strip()]
+        if not lines:
+            return 'easy'
+        
+        # 长度：越接近块大小越难
+        score = 0.6 * min(len(chunk) / self.chunk_size, 1.0)
+        
+        # 已有编号：原文结构越清晰越容易
+        numbered = sum(1 for line in lines if NUMBERING_PATTERN.match(line))
+        score -= numbered / len(lines)
+        
+        # 行密度：大段不换行的密集文本更难
+        if sum(len(line) for line in lines) / len(lines) > 200:
+            score += 0.5
+        
+        # 中英混排
+        cjk = len(CJK_PATTERN.findall(chunk))
+        latin = len(LATIN_PATTERN.findall(chunk))
+        if cjk + latin and min(cjk, latin) / (cjk + latin) > 0.2:
+            score += 0.5
+        
+        return 'hard' if score >= HARD_CHUNK_SCORE else 'easy'
+
+    def verify_result(self, chunk: str, result: str, is_first: bool = True) -> bool:
+        """
+        校验整理结果：正文没有被大量删减；第一个块还必须包含标题。
+        后续块按提示词要求避免重复已有标题，没有标题也是正常结果。
+        """
+        if not result or not result.strip():
+            return False
+        
+        lines = result.split('\n')
+        if is_first and not any(HEADER_PATTERN.match(line.strip()) for line in lines):
+            return False
+        
+        body = ''.join(line for line in lines if not HEADER_PATTERN.match(line.strip()))
+        original_length = len(re.sub(r'\s', '', chunk))
+        return len(re.sub(r'\s', '', body)) >= original_length * MIN_CONTENT_RATIO
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        粗略估算 token 数：汉字约1个 token，其他字符约4个一个 token
+        """
+        if not text:
+            return 0
+        cjk = len(CJK_PATTERN.findall(text))
+        return cjk + (len(text) - cjk) // 4 + 1
+
+    def _estimate_request_tokens(self, chunk: str, previous_structure: str = None) -> int:
+        """
+        估算一次请求的 token 消耗（输入 + 与原文等长的输出）
+        """
+        return (2 * self.estimate_tokens(chunk) + self.estimate_tokens(previous_structure)
+                + PROMPT_OVERHEAD_TOKENS)
+
+    def _pick_model(self, preferred: str, estimate: int) -> Optional[str]:
+        """
+        在预算约束下选择模型，预算不足时逐级降级
+        
+        Returns:
+            Optional[str]: 可用的模型；返回 None 表示预算已耗尽，应保留原文
+        """
+        if self.token_budget is None:
+            return preferred
+        
+        committed = self.tokens_used + self.tokens_reserved
+        if committed + estimate > self.token_budget:
+            return None
+        
+        if (preferred == self.strong_model and
+                committed > self.token_budget * STRONG_MODEL_BUDGET_RATIO):
+            return self.fast_model
+        
+        return preferred
+
+    async def structure_chunk(self, chunk: str, is_first: bool = False, previous_structure: str = None) -> str:
+        """
+        按难度路由处理单个文本块：简单块交给快速模型，复杂块或校验失败的结果升级到强模型。
+        预算耗尽时直接返回原文，不中断整个任务。
+        """
+        estimate = self._estimate_request_tokens(chunk, previous_structure)
+        difficulty = self.classify_chunk(chunk)
+        preferred = self.strong_model if difficulty == 'hard' else self.fast_model
+        
+        model = self._pick_model(preferred, estimate)
+        if model is None:
+            self.logger.warning("token 预算已耗尽，文本块保留原文")
+            return chunk
+        
+        self.logger.log(SAMPLED, f"文本块难度为 {difficulty}，使用模型 {model}")
+        try:
+            result = await self.process_chunk(chunk, is_first, previous_structure, model=model)
+            if model == self.strong_model or self.verify_result(chunk, result, is_first):
+                return result
+            self.logger.warning("整理结果校验未通过，尝试升级模型")
+        except Exception:
+            if model == self.strong_model:
+                raise
+            self.logger.warning("快速模型处理失败，尝试升级模型")
+            result = chunk
+        
+        if self._pick_model(self.strong_model, estimate) != self.strong_model:
+            self.logger.warning("预算不足，无法升级模型，使用当前结果")
+            return result
+        
+        return await self.process_chunk(chunk, is_first, previous_structure, model=self.strong_model)
+
+    def build_prompt(self, chunk: str, is_first: bool = False, previous_structure: str = None) -> str:
+        """
+        构建整理单个文本块的提示词
+        """
+        if is_first:
+            prompt = f"""
+            请将以下文本整理为结构化的格式，使用markdown标题��
+
+            {chunk}
+
+            要求：
+            1. 分析文本内容，提取关键主题
+            2. 创建合适的标题层级结构
+            3. 使用markdown标题格式（#、##、###等）
+            4. 不要修改原文任何内容
+            5. 确保内容的逻辑性和连贯性
+            """
+        else:
+            prompt = f"""
+            请接续前面的任务，继续整理文本格式，这是长文本的后续部分。
+            前面所有块的标题结构如下：
+
+            {previous_structure}
+
+            请处理以下内容，参考前文的整体结构：
+
+            {chunk}
+
+            要求：
+            1. 参考前文的整体标题结构
+            2. 保持标题层级的一致性
+            3. 使用markdown标题格式
+            4. 不要修改原文任何内容
+            5. 确保与前文的连贯性
+            6. 避免重复已有的标题层级
+            """
+        return prompt
+
+    async def process_chunk(self, chunk: str, is_first: bool = False, previous_structure: str = None,
+                            model: str = None) -> str:
         """
         处理单个文本块，将其整理为带标题的结构化文本
         
@@ -163,74 +491,191 @@ class TextStructurizer:
             chunk: 文本块
             is_first: 是否是第一个块
             previous_structure: 所有之前块的标题结构
+            model: 使用的模型，默认为快速模型
         """
         try:
-            system_prompt = "你是一个专业的文档结构化助手，善于将文本整理为清晰的层级结构。"
-            
             if is_first:
                 self.logger.info("处理第一个文本块，创建文档结构...")
-                prompt = f"""
-                请将以下文本整理为结构化的格式，使用markdown标题��
-
-                {chunk}
-
-                要求：
-                1. 分析文本内容，提取关键主题
-                2. 创建合适的标题层级结构
-                3. 使用markdown标题格式（#、##、###等）
-                4. 不要修改原文任何内容
-                5. 确保内容的逻辑性和连贯性
-                """
             else:
-                self.logger.info("处理后续文本块，保持结构一致...")
-                prompt = f"""
-                请接续前面的任务，继续整理文本格式，这是长文本的后续部分。
-                前面所有块的标题结构如下：
-
-                {previous_structure}
-
-                请处理以下内容，参考前文的整体结构：
-
-                {chunk}
-
-                要求：
-                1. 参考前文的整体标题结构
-                2. 保持标题层级的一致性
-                3. 使用markdown标题格式
-                4. 不要修改原文任何内容
-                5. 确保与前文的连贯性
-                6. 避免重复已有的标题层级
-                """
+                self.logger.log(SAMPLED, "处理后续文本块，保持结构一致...")
+            prompt = self.build_prompt(chunk, is_first, previous_structure)
+            estimate = self._estimate_request_tokens(chunk, previous_structure)
+            return await self._complete(prompt, model or self.fast_model, estimate)
+        except Exception as e:
+            self.logger.error(f"处理文本块时发生错误: {str(e)}")
+            raise
 
+    async def _complete(self, prompt: str, model: str, estimate: int) -> str:
+        """
+        调用大模型并记录 token 消耗
+        
+        请求发出前先按估算值预占预算，返回后再按实际用量结算。调用方在 _pick_model 检查预算后
+        不经过任何 await 即进入这里，因此并发请求不会同时通过同一份剩余预算。
+        """
+        self.tokens_reserved += estimate
+        try:
             response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
+                model=model,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ]
             )
+        finally:
+            self.tokens_reserved -= estimate
+        
+        content = response.choices[0].message.content
+        if response.usage is not None:
+            self.tokens_used += response.usage.total_tokens
+        else:
+            self.tokens_used += self.estimate_tokens(SYSTEM_PROMPT + prompt) + self.estimate_tokens(content)
+        
+        return content
+
+    def pack_documents(self, texts: List[str]) -> List[List[int]]:
+        """
+        将不超过 chunk_size 的小文档按顺序装箱，每箱总长度不超过 chunk_size
+        
+        Returns:
+            List[List[int]]: 每个请求包含的文档下标；超过 chunk_size 的文档不参与打包
+        """
+        packs = []
+        current_pack = []
+        current_size = 0
+        
+        for index, text in enumerate(texts):
+            if len(text) > self.chunk_size:
+                continue
+            # 起止标记约占 40 个字符
+            size = len(text) + 40
+            if current_pack and current_size + size > self.chunk_size:
+                packs.append(current_pack)
+                current_pack = []
+                current_size = 0
+            current_pack.append(index)
+            current_size += size
+        
+        if current_pack:
+            packs.append(current_pack)
+        return packs
+
+    async def process_packed(self, texts: List[str]) -> List[str]:
+        """
+        用一次请求整理多个小文档，按起止标记拆分结果。
+        某个文档的标记丢失或结果校验失败时，该文档单独重新请求。
+        """
+        if len(texts) == 1:
+            try:
+                return [await self.structure_chunk(texts[0], is_first=True)]
+            except Exception as e:
+                self.logger.error(f"文档处理失败: {str(e)}")
+                return [e]
+        
+        documents = "\n\n".join(
+            f"{DOC_START_MARK.format(doc_id=i)}\n{text}\n{DOC_END_MARK.format(doc_id=i)}"
+            for i, text in enumerate(texts)
+        )
+        prompt = f"""
+                以下是 {len(texts)} 个相互独立的文档，每个文档以 <<<DOC 编号>>> 开始、以 <<<END 编号>>> 结束。
+                请将每个文档分别整理为结构化的格式，使用markdown标题：
+
+                {documents}
+
+                要求：
+                1. 每个文档单独分析，创建合适的标题层级结构
+                2. 使用markdown标题格式（#、##、###等）
+                3. 不要修改原文任何内容
+                4. 原样保留每个文档的起止标记和编号，标记单独成行
+                5. 不要在标记之外输出任何内容
+                """
+        
+        outputs = {}
+        difficulty = 'hard' if any(self.classify_chunk(text) == 'hard' for text in texts) else 'easy'
+        preferred = self.strong_model if difficulty == 'hard' else self.fast_model
+        estimate = self._estimate_request_tokens(documents)
+        model = self._pick_model(preferred, estimate)
+        if model is not None:
+            self.logger.info(f"打包处理 {len(texts)} 个文档，使用模型 {model}")
+            try:
+                response = await self._complete(prompt, model, estimate)
+                outputs = {int(match.group(1)): match.group(2)
+                           for match in DOC_BLOCK_PATTERN.finditer(response)}
+            except Exception as e:
+                self.logger.warning(f"打包请求失败，改为逐个处理: {str(e)}")
+        
+        results = []
+        for i, text in enumerate(texts):
+            output = outputs.get(i)
+            if output is not None and self.verify_result(text, output):
+                results.append(output)
+                continue
             
-            return response.choices[0].message.content
-        except Exception as e:
-            self.logger.error(f"处理文本块时发生错误: {str(e)}")
-            raise
+            if model is not None:
+                self.logger.warning(f"打包结果中第 {i} 个文档拆分失败，单独处理")
+            try:
+                results.append(await self.structure_chunk(text, is_first=True))
+            except Exception as e:
+                # 单个文档失败不影响同一请求中的其他文档
+                self.logger.error(f"第 {i} 个文档单独处理失败: {str(e)}")
+                results.append(e)
+        return results
 
-    def extract_structure(self, text: str) -> str:
+    async def process_documents(self, texts: List[str],
+                                max_concurrency: int = 4) -> List[Union[str, Exception]]:
         """
-        提取文本中的标题结构
+        批量整理多个文档：小文档打包后共用请求，超过 chunk_size 的文档单独按 process_text 处理。
+        整批文档共用一个 token 预算。单个文档出错不会影响其他文档。
+        
+        Args:
+            texts: 文档列表
+            max_concurrency: 同时进行的打包请求数
+            
+        Returns:
+            List[Union[str, Exception]]: 与输入顺序一致的整理结果，处理失败的文档对应其异常
         """
-        structure = []
-        for line in text.split('\n'):
-            if line.strip().startswith('#'):
-                structure.append(line.strip())
-        return '\n'.join(structure)
+        self.tokens_used = 0
+        results = [None] * len(texts)
+        packs = self.pack_documents(texts)
+        self.logger.info(f"{sum(len(pack) for pack in packs)} 个小文档打包为 {len(packs)} 个请求")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run_pack(pack: List[int]):
+            async with semaphore:
+                with log_context(chunk_id=f"docs{pack[0]}-{pack[-1]}"):
+                    try:
+                        outputs = await self.process_packed([texts[i] for i in pack])
+                    except Exception as e:
+                        self.logger.error(f"打包请求处理失败: {str(e)}")
+                        outputs = [e] * len(pack)
+            for i, output in zip(pack, outputs):
+                results[i] = output
+        
+        await asyncio.gather(*(run_pack(pack) for pack in packs))
+        
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                try:
+                    results[i] = await self.process_text(text, new_job=False)
+                except Exception as e:
+                    results[i] = e
+        
+        if self.token_budget is not None:
+            self.logger.info(f"本次任务消耗 token：{self.tokens_used}/{self.token_budget}")
+        return results
 
-    async def process_text(self, input_text: str) -> str:
+    async def process_text(self, input_text: str, new_job: bool = True) -> str:
         """
         处理输入文本，生成结构化内容
+        
+        Args:
+            input_text: 输入文本
+            new_job: 是否作为新任务重新计算 token 预算
         """
         try:
             self.logger.info("开始处理文本...")
+            if new_job:
+                self.tokens_used = 0
             chunks = self.split_text(input_text)
             self.logger.info(f"文本已分割为 {len(chunks)} 个块")
             
@@ -238,16 +683,18 @@ class TextStructurizer:
             previous_titles = set()  # 使用集合存储已有的标题，避免重复
             
             # 使用tqdm创建进度条
+            from tqdm import tqdm
             for i in tqdm(range(len(chunks)), desc="处理文本块"):
                 chunk = chunks[i]
                 # 构建前文结构字符串
                 previous_structure = "\n".join(sorted(previous_titles)) if previous_titles else ""
                 
-                result = await self.process_chunk(
-                    chunk, 
-                    is_first=(i == 0),
-                    previous_structure=previous_structure
-                )
+                with log_context(chunk_id=i):
+                    result = await self.structure_chunk(
+                        chunk, 
+                        is_first=(i == 0),
+                        previous_structure=previous_structure
+                    )
                 results.append(result)
                 
                 # 提取当前块的标题并添加到已有标题集合中
@@ -255,6 +702,9 @@ class TextStructurizer:
                                    if line.strip().startswith('#'))
                 previous_titles.update(current_titles)
                 
+            if self.token_budget is not None:
+                self.logger.info(f"本次任务消耗 token：{self.tokens_used}/{self.token_budget}")
+            
             if len(results) == 1:
                 self.logger.info("文本处理完成")
                 return results[0]
@@ -268,6 +718,93 @@ class TextStructurizer:
             self.logger.error(f"处理文本时发生错误: {str(e)}")
             raise
 
+    def build_batch_requests(self, input_text: str, job_id: str) -> List[Dict]:
+        """
+        将一个文档的所有文本块生成离线批量请求（OpenAI Batch 格式，每行一个请求）
+        
+        离线模式下无法获得前文整理结果，后续块的前文结构留空；模型仍按难度路由。
+        请求在执行前一次性生成，不受 token_budget 约束，也不会因预算降级模型。
+        
+        Args:
+            input_text: 输入文本
+            job_id: 任务标识（如文件路径），写入 custom_id 用于回收结果
+        """
+        requests = []
+        for i, chunk in enumerate(self.split_text(input_text)):
+            model = self.strong_model if self.classify_chunk(chunk) == 'hard' else self.fast_model
+            requests.append({
+                "custom_id": f"{job_id}#{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": [
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": self.build_prompt(chunk, is_first=(i == 0), previous_structure="")}
+                    ]
+                }
+            })
+        return requests
+
+    def write_batch_file(self, jobs: Dict[str, str], batch_path: str) -> int:
+        """
+        将多个文档的全部请求写入 JSONL 批量文件
+        
+        Args:
+            jobs: {任务标识: 文本}
+            batch_path: 输出的批量请求文件路径
+            
+        Returns:
+            int: 写入的请求数
+        """
+        count = 0
+        with open(batch_path, 'w', encoding='utf-8') as f:
+            for job_id, input_text in jobs.items():
+                for request in self.build_batch_requests(input_text, job_id):
+                    f.write(json.dumps(request, ensure_ascii=False) + '\n')
+                    count += 1
+        self.logger.info(f"已写入 {count} 个批量请求：{batch_path}")
+        return count
+
+    def read_batch_results(self, results_path: str) -> Dict[str, Dict[int, str]]:
+        """
+        读取批量结果文件，只保留成功的结果
+        
+        Returns:
+            Dict[str, Dict[int, str]]: {任务标识: {块序号: 整理结果}}
+        """
+        results = {}
+        for record in iter_batch_results(results_path):
+            job_id, index = record["custom_id"].rsplit('#', 1)
+            body = record["response"]["body"]
+            results.setdefault(job_id, {})[int(index)] = body["choices"][0]["message"]["content"]
+        return results
+
+    async def ingest_batch_results(self, jobs: Dict[str, str], results_path: str) -> Dict[str, str]:
+        """
+        根据批量结果文件完成各文档的合并。缺失或校验失败的块保留原文。
+        
+        Args:
+            jobs: {任务标识: 原始文本}，与生成批量文件时一致
+            results_path: 批量结果文件路径
+            
+        Returns:
+            Dict[str, str]: {任务标识: 整理后的文本}
+        """
+        batch_results = self.read_batch_results(results_path)
+        merged = {}
+        for job_id, input_text in jobs.items():
+            chunk_results = batch_results.get(job_id, {})
+            results = []
+            for i, chunk in enumerate(self.split_text(input_text)):
+                result = chunk_results.get(i)
+                if result is None or not self.verify_result(chunk, result, is_first=(i == 0)):
+                    self.logger.warning(f"{job_id} 第 {i} 块缺少有效结果，保留原文")
+                    result = chunk
+                results.append(result)
+            merged[job_id] = await self.merge_results(results) if len(results) > 1 else results[0]
+        return merged
+
     async def merge_results(self, results: List[str]) -> str:
         """
         合并多个处理结果
@@ -275,40 +812,8 @@ class TextStructurizer:
         try:
             self.logger.info("开始合并处理结果...")
             
-            # 使用第一个结果作为基础
-            merged_text = results[0]
-            structure = self.extract_structure(merged_text)
-            
-            # 记录已有的标题，避免重复
-            existing_titles = set(structure.split('\n'))
-            
-            # 合并后续结果
-            for result in results[1:]:
-                lines = result.split('\n')
-                content_lines = []
-                current_title = None
-                
-                for line in lines:
-                    stripped_line = line.strip()
-                    # 处理标题行
-                    if stripped_line.startswith('#'):
-                        if stripped_line not in existing_titles:
-                            current_title = stripped_line
-                            content_lines.append(line)
-                            existing_titles.add(stripped_line)
-                    # 处理内容行
-                    else:
-                        # 只添加非空行和有意义的内容
-                        if stripped_line and not stripped_line.isspace():
-                            content_lines.append(line)
-                
-                # 添加新内容，确保有适当的分隔
-                if content_lines:
-                    if not merged_text.endswith('\n'):
-                        merged_text += '\n'
-                    if not merged_text.endswith('\n\n'):
-                        merged_text += '\n'
-                    merged_text += '\n'.join(content_lines)
+            merger = ResultMerger()
+            merged_text = ''.join(merger.add(result) for result in results)
             
             self.logger.info("文本合并完成")
             return merged_text